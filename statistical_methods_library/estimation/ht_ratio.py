@@ -6,7 +6,7 @@ For Copyright information, please see LICENCE.
 import typing
 
 from pyspark.sql import DataFrame
-from pyspark.sql.functions import col, count, first, lit, sum, when
+from pyspark.sql.functions import broadcast, col, count, lit, min, sum, when
 from pyspark.sql.types import BooleanType, DecimalType, StringType
 
 from statistical_methods_library.utilities import validation
@@ -26,6 +26,7 @@ def estimate(
     unadjusted_design_weight_col: typing.Optional[str] = None,
     design_weight_col: typing.Optional[str] = "design_weight",
     calibration_factor_col: typing.Optional[str] = "calibration_factor",
+    validate_input: bool = True,
 ) -> DataFrame:
     """
     Perform Horvitz-Thompson estimation.
@@ -69,6 +70,10 @@ def estimate(
           will contain the adjusted value.
         calibration_factor_col: The name of the column which will contain the
           calibration factor if Ratio Estimation is performed.
+        validate_input: Set to False to skip the checks on the contents of the
+          input data (duplicates, nulls, marker values and h values) which
+          each require a pass over the data. Column names and types are
+          always checked.
 
     Returns:
     A data frame containing the estimated weights. The exact columns depend on
@@ -82,7 +87,9 @@ def estimate(
     If `out_of_scope_full` is also specified, out of scope adjustment
     is performed during birth-death adjustment.
 
-    All specified input columns must be fully populated.
+    All specified input columns must be fully populated. When
+    `validate_input` is False the caller is responsible for ensuring this and
+    the other constraints on the input data.
     Since `design_weight_col` and `calibration_factor_col` are both
     output columns this does not apply to them, and any values they contain prior
     to calling the method will be ignored.
@@ -128,50 +135,87 @@ def estimate(
         "auxiliary": DecimalType,
     }
 
-    aliased_df = validation.validate_dataframe(
-        input_df, input_params, type_mapping, ["unique_identifier", "period"]
-    )
-
-    # h values must not change within a stratum
-    if h_value_col is not None:
-        validation.validate_one_value_per_group(
-            input_df, [period_col, strata_col], h_value_col
-        )
-
     # Values for the marker column used for birth-death and out of scope adjustment.
     # I - In Scope, O - Out Of Scope, D - Dead
     all_adjustment_markers = {"I", "O", "D"}
     death_adjustment_markers = {"I", "D"}
 
+    # These checks are performed in the same pass over the data as the null
+    # checks so they refer to the aliased column names.
+    checks = []
+
     if adjustment_marker_col is not None:
-        validation.validate_no_matching_rows(
-            input_df,
-            ((~col(sample_marker_col)) & (col(adjustment_marker_col) != "I")),
-            "Unsampled responders must only contain an 'I' marker.",
+        checks.append(
+            validation.no_matching_rows_check(
+                (~col("sample_marker")) & (col("adjustment_marker") != "I"),
+                "Unsampled responders must only contain an 'I' marker.",
+            )
         )
         if out_of_scope_full is not None:
-            validation.validate_no_matching_rows(
-                input_df,
-                (~col(adjustment_marker_col).isin(all_adjustment_markers)),
-                f"The {adjustment_marker_col} must only contain 'I', 'O' or 'D'.",
+            checks.append(
+                validation.no_matching_rows_check(
+                    ~col("adjustment_marker").isin(all_adjustment_markers),
+                    f"The {adjustment_marker_col} must only contain 'I', 'O' or 'D'.",
+                )
             )
         else:
-            validation.validate_no_matching_rows(
-                input_df,
-                (~col(adjustment_marker_col).isin(death_adjustment_markers)),
-                f"The {adjustment_marker_col} must only contain 'I' or 'D'.",
+            checks.append(
+                validation.no_matching_rows_check(
+                    ~col("adjustment_marker").isin(death_adjustment_markers),
+                    f"The {adjustment_marker_col} must only contain 'I' or 'D'.",
+                )
             )
 
-    # --- prepare our working data frame ---
-    working_df = aliased_df.withColumn(
-        "sample_marker", col("sample_marker").cast(DecimalType())
+    aliased_df = validation.validate_dataframe(
+        input_df,
+        input_params,
+        type_mapping,
+        ["unique_identifier", "period"],
+        additional_checks=checks,
+        validate_content=validate_input,
     )
+
+    # h values must not change within a stratum
+    if h_value_col is not None and validate_input:
+        validation.validate_one_value_per_group(
+            aliased_df,
+            ["period", "strata"],
+            "h_value",
+            f"The {h_value_col} must be the same per {period_col} {strata_col}.",
+        )
+
+    # --- prepare our working data frame ---
+    # This is built as a single projection containing only the columns used
+    # in the calculations below.
+    working_cols = [
+        "period",
+        "strata",
+        col("sample_marker").cast(DecimalType()).alias("sample_marker"),
+    ]
     if adjustment_marker_col is None:
-        working_df = working_df.withColumn("adjustment_marker", lit("I"))
-        working_df = working_df.withColumn("h_value", lit(0))
+        working_cols += [lit("I").alias("adjustment_marker"), lit(0).alias("h_value")]
     else:
-        working_df = working_df.withColumn(
-            "h_value", col("h_value").cast(DecimalType())
+        working_cols += [
+            "adjustment_marker",
+            col("h_value").cast(DecimalType()).alias("h_value"),
+        ]
+
+    if auxiliary_col is not None:
+        working_cols.append("auxiliary")
+
+    if calibration_group_col is not None:
+        working_cols.append("calibration_group")
+
+    working_df = aliased_df.select(working_cols)
+
+    # Ratio estimation reads the working data again after calculating the
+    # design weights so avoid recomputing it from the input. Partitioning by
+    # period and stratum up front means that the design weight aggregation
+    # and the separate ratio calibration aggregation can reuse the partitioning
+    # rather than each shuffling the data.
+    if auxiliary_col is not None:
+        working_df = working_df.repartition("period", "strata").localCheckpoint(
+            eager=False
         )
 
     def count_conditional(cond):
@@ -184,66 +228,55 @@ def estimate(
     # marker provided. Due to the fact that sample is either 0 or 1
     # (after converting bool to int), summing this column gives
     # the number of contributors in the sample. There's only ever
-    # 1 h value per strata, so we can just take the first one in that period and strata,
+    # 1 h value per strata, so we can just take the minimum in that period and strata,
     # and every contributor must have a sample marker so counting this column
     # gives us the total population.
 
+    # Out of scope contributors are always removed from the denominator of
+    # the adjustment fraction but are only added to the numerator when full
+    # out of scope adjustment is being performed.
+    if out_of_scope_full is True or out_of_scope_full is None:
+        out_of_scope_numerator = col("out_of_scope_marker")
+    else:
+        out_of_scope_numerator = lit(0)
+
+    unadjusted_design_weight = col("sample_count") / col("sample_sum")
     design_df = (
         working_df.groupBy(["period", "strata"])
         .agg(
             sum(col("sample_marker")).alias("sample_sum"),
             count_conditional(col("adjustment_marker") == "D").alias("death_marker"),
-            first(col("h_value")),
+            min(col("h_value")).alias("h_value"),
             count_conditional(col("adjustment_marker") == "O").alias(
                 "out_of_scope_marker"
             ),
             count(col("sample_marker")).alias("sample_count"),
         )
-        .withColumn(
-            "unadjusted_design_weight",
-            col("sample_count") / col("sample_sum"),
-        )
-    )
-
-    if out_of_scope_full is True or out_of_scope_full is None:
-        design_df = design_df.withColumn(
-            "out_of_scope_marker_numerator", col("out_of_scope_marker")
-        )
-        design_df = design_df.withColumn(
-            "out_of_scope_marker_denominator", col("out_of_scope_marker")
-        )
-    else:
-        design_df = design_df.withColumn("out_of_scope_marker_numerator", lit(0))
-        design_df = design_df.withColumn(
-            "out_of_scope_marker_denominator", col("out_of_scope_marker")
-        )
-
-    design_df = design_df.withColumn(
-        "design_weight",
-        (
-            col("unadjusted_design_weight")
-            * (
-                1
-                + (
-                    col("first(h_value)")
-                    * (col("death_marker") + col("out_of_scope_marker_numerator"))
-                    / (
-                        col("sample_sum")
-                        - col("death_marker")
-                        - col("out_of_scope_marker_denominator")
+        .select(
+            "period",
+            "strata",
+            unadjusted_design_weight.alias("unadjusted_design_weight"),
+            (
+                unadjusted_design_weight
+                * (
+                    1
+                    + (
+                        col("h_value")
+                        * (col("death_marker") + out_of_scope_numerator)
+                        / (
+                            col("sample_sum")
+                            - col("death_marker")
+                            - col("out_of_scope_marker")
+                        )
                     )
                 )
-            )
-        ),
-    ).drop(
-        "sample_sum",
-        "death_marker",
-        "first(h_value)",
-        "out_of_scope_marker_numerator",
-        "out_of_scope_marker_denominator",
-        "sample_count",
+            ).alias("design_weight"),
+        )
     )
 
+    if auxiliary_col is not None:
+        design_df = design_df.localCheckpoint(eager=False)
+
     # --- Ratio estimation ---
     # Note: if we don't have the columns for this then only Expansion
     # estimation is performed.
@@ -253,16 +286,18 @@ def estimate(
     def calibration_calculation(df: DataFrame, group_col: str) -> DataFrame:
         group_cols = ["period", group_col]
         return (
-            df.withColumn(
-                "aux_design",
-                col("auxiliary")
-                * col("unadjusted_design_weight")
-                * col("sample_marker"),
+            df.groupBy(group_cols)
+            .agg(
+                sum(col("auxiliary")).alias("aux_sum"),
+                sum(
+                    col("auxiliary")
+                    * col("unadjusted_design_weight")
+                    * col("sample_marker")
+                ).alias("aux_design_sum"),
             )
-            .groupBy(group_cols)
-            .agg({"auxiliary": "sum", "aux_design": "sum"})
-            .withColumn(
-                "calibration_factor", col("sum(auxiliary)") / col("sum(aux_design)")
+            .select(
+                *group_cols,
+                (col("aux_sum") / col("aux_design_sum")).alias("calibration_factor"),
             )
         )
 
@@ -272,24 +307,28 @@ def estimate(
     ]
     if auxiliary_col is not None:
         # We can perform some sort of ratio estimation since we have an
-        # auxiliary value.
-        working_df = working_df.join(design_df, ["period", "strata"])
+        # auxiliary value. Only the unadjusted design weight is needed to
+        # calculate calibration factors and the design weights only have a row
+        # per period and stratum so are small enough to broadcast.
+        calibration_df = working_df.join(
+            broadcast(design_df.select("period", "strata", "unadjusted_design_weight")),
+            ["period", "strata"],
+        )
         if calibration_group_col is not None:
             # We have a calibration group so perform Combined Ratio estimation.
             return_col_list.append(
                 col("calibration_group").alias(calibration_group_col)
             )
+            # The design weights are determined by the period and stratum so
+            # only deduplicate the keys before joining them back on.
             estimated_df = (
-                working_df.select(
-                    "period",
-                    "strata",
-                    "calibration_group",
-                    "unadjusted_design_weight",
-                    "design_weight",
-                )
-                .distinct()
+                working_df.select("period", "strata", "calibration_group")
+                .dropDuplicates()
+                .join(broadcast(design_df), ["period", "strata"])
                 .join(
-                    calibration_calculation(working_df, "calibration_group"),
+                    broadcast(
+                        calibration_calculation(calibration_df, "calibration_group")
+                    ),
                     ["period", "calibration_group"],
                 )
             )
@@ -297,7 +336,8 @@ def estimate(
         else:
             # No calibration group so perform Separate Ratio estimation.
             estimated_df = design_df.join(
-                calibration_calculation(working_df, "strata"), ["period", "strata"]
+                broadcast(calibration_calculation(calibration_df, "strata")),
+                ["period", "strata"],
             )
 
         return_col_list += [
@@ -4,6 +4,16 @@ Perform link-based imputation on a data frame.
 This module provides the engine and other core aspects of imputation with
 ratio calculation being handled by provided callables.
 
+Many of the aggregations performed during imputation (e.g. ratio calculation)
+only produce a row per period and grouping. As such the engine does not alter
+the Spark session's configuration but running with adaptive query execution
+enabled (`spark.sql.adaptive.enabled` and
+`spark.sql.adaptive.coalescePartitions.enabled`) allows Spark to avoid
+spreading these small results over the full number of shuffle partitions.
+Similarly, if a few groupings contain most of the contributors then also
+enabling `spark.sql.adaptive.skewJoin.enabled` allows Spark to split up the
+largest partitions when joining.
+
 For Copyright information, please see LICENCE.
 """
 from decimal import Decimal
@@ -12,13 +22,20 @@ from functools import reduce
 from typing import Optional, Union
 
 from pyspark.sql import Column, DataFrame
-from pyspark.sql.functions import col, expr, first, lit, when
+from pyspark.sql.functions import (
+    broadcast,
+    coalesce,
+    col,
+    count,
+    expr,
+    first,
+    lit,
+    when,
+)
 from pyspark.sql.types import DecimalType, StringType
+from pyspark.sql.window import Window
 
-from statistical_methods_library.utilities.periods import (
-    calculate_next_period,
-    calculate_previous_period,
-)
+from statistical_methods_library.utilities.periods import calculate_period_index
 from statistical_methods_library.utilities.validation import validate_dataframe
 
 from .ratio_calculators import RatioCalculator, ratio_of_means_construction
@@ -239,6 +256,7 @@ def impute(
             raise TypeError("weight must be of type Decimal")
 
         weight = lit(weight)
+        previous_weight = lit(Decimal(1)) - weight
         weight_periodicity = weight_periodicity_multiplier * periodicity
         weight_col_mapping = {
             "forward_unweighted": unweighted_forward_link_col,
@@ -268,39 +286,33 @@ def impute(
         "construction_unweighted": DecimalType,
     }
 
-    if link_filter:
-        if back_data_df:
-            filtered_refs = input_df.unionByName(back_data_df, allowMissingColumns=True)
-        else:
-            filtered_refs = input_df
-
-        filtered_refs = filtered_refs.select(
-            col(reference_col).alias("ref"),
-            col(period_col).alias("period"),
-            col(grouping_col).alias("grouping"),
-            (expr(link_filter) if isinstance(link_filter, str) else link_filter).alias(
-                "match"
-            ),
-        ).localCheckpoint(eager=False)
-
-    prepared_df = (
-        validate_dataframe(
-            input_df,
-            input_params,
-            type_mapping,
-            ["ref", "period", "grouping"],
-            ["target"],
-        )
-        .withColumnRenamed("target", "output")
-        .withColumn("marker", when(~col("output").isNull(), Marker.RESPONSE.value))
-        .withColumn(
-            "previous_period", calculate_previous_period(col("period"), periodicity)
+    prepared_df = validate_dataframe(
+        input_df,
+        input_params,
+        type_mapping,
+        ["ref", "period", "grouping"],
+        ["target"],
+    )
+    prepared_df = prepared_df.select(
+        *(c for c in prepared_df.columns if c != "target"),
+        col("target").alias("output"),
+        when(col("target").isNotNull(), Marker.RESPONSE.value).alias("marker"),
+        calculate_period_index(col("period")).alias("period_index"),
+    )
+    # Note: prior_period contains a period index rather than a period so it's
+    # compared against period_index. Since periods are fixed width the minimum
+    # period is the same as the period with the minimum index, so only the
+    # single aggregated value needs converting rather than every row. This
+    # only has a single row so it's always broadcast when joined.
+    prior_period_df = broadcast(
+        prepared_df.selectExpr("min(period) AS min_period")
+        .select(
+            (calculate_period_index(col("min_period")) - periodicity).alias(
+                "prior_period"
+            )
         )
-        .withColumn("next_period", calculate_next_period(col("period"), periodicity))
+        .localCheckpoint(eager=False)
     )
-    prior_period_df = prepared_df.selectExpr(
-        "min(previous_period) AS prior_period"
-    ).localCheckpoint(eager=False)
 
     if back_data_df:
         validated_back_data_df = validate_dataframe(
@@ -308,21 +320,24 @@ def impute(
             back_input_params,
             type_mapping,
             ["ref", "period", "grouping"],
-        ).localCheckpoint(eager=False)
+        )
+        # Only link weighting reads the back data again after the prior period
+        # has been extracted below so there's no need to keep it otherwise.
+        if weight is not None:
+            validated_back_data_df = validated_back_data_df.localCheckpoint(eager=False)
+
         back_data_period_df = (
             validated_back_data_df.select(
-                "ref", "period", "grouping", "output", "marker"
+                "ref",
+                "period",
+                "grouping",
+                "output",
+                "marker",
+                calculate_period_index(col("period")).alias("period_index"),
             )
-            .join(prior_period_df, [col("period") == col("prior_period")])
+            .join(prior_period_df, [col("period_index") == col("prior_period")])
             .drop("prior_period")
-            .filter(((col(marker_col) != lit(Marker.BACKWARD_IMPUTE.value))))
-            .withColumn(
-                "previous_period",
-                calculate_previous_period(col("period"), periodicity),
-            )
-            .withColumn(
-                "next_period", calculate_next_period(col("period"), periodicity)
-            )
+            .filter(col("marker") != lit(Marker.BACKWARD_IMPUTE.value))
             .localCheckpoint(eager=False)
         )
         prepared_df = prepared_df.unionByName(
@@ -330,94 +345,163 @@ def impute(
             allowMissingColumns=True,
         )
 
+    if link_filter:
+        if back_data_df:
+            # Only back data for the prior period is ever matched against so
+            # don't evaluate the filter for the rest of it.
+            filtered_refs = input_df.unionByName(
+                back_data_df.join(
+                    prior_period_df,
+                    [calculate_period_index(col(period_col)) == col("prior_period")],
+                    "left_semi",
+                ),
+                allowMissingColumns=True,
+            )
+        else:
+            filtered_refs = input_df
+
+        # This is only used once when calculating ratios so it isn't
+        # checkpointed. This allows the projection to be pushed down to the
+        # source rather than materialising a separate copy of the data.
+        filtered_refs = filtered_refs.select(
+            col(reference_col).alias("ref"),
+            col(period_col).alias("period"),
+            col(grouping_col).alias("grouping"),
+            (expr(link_filter) if isinstance(link_filter, str) else link_filter).alias(
+                "match"
+            ),
+        )
+
+    # Most of the work is done per contributor so co-locate the data for each
+    # contributor once here. The windows over ref and grouping can then reuse
+    # this partitioning rather than each shuffling the data. Sorting each
+    # contributor's data by period here similarly means that the windows
+    # don't each need to sort it. When filtering links the data is joined to
+    # the filter first which shuffles it anyway and the windows repartition
+    # the result by contributor.
+    if not link_filter:
+        prepared_df = prepared_df.repartition("ref", "grouping").sortWithinPartitions(
+            "ref", "grouping", "period_index"
+        )
+
     def calculate_ratios():
         # This allows us to return early if we have nothing to do
         nonlocal prepared_df
         ratio_calculators = []
+        # Provided links still need default and count columns so that the
+        # output is the same shape as for calculated links. These are all
+        # added in a single projection.
+        provided_link_cols = []
         if "forward" in prepared_df.columns:
-            prepared_df = (
-                prepared_df.withColumn("default_forward", expr("forward IS NULL"))
-                .withColumn("default_backward", expr("backward IS NULL"))
-                .withColumn("count_forward", lit(0).cast("long"))
-                .withColumn("count_backward", lit(0).cast("long"))
-            )
+            provided_link_cols += [
+                expr("forward IS NULL AS default_forward"),
+                expr("backward IS NULL AS default_backward"),
+                lit(0).cast("long").alias("count_forward"),
+                lit(0).cast("long").alias("count_backward"),
+            ]
 
         else:
             ratio_calculators.append(forward_backward_ratio_calculator)
 
         if "construction" in prepared_df.columns:
-            prepared_df = prepared_df.withColumn(
-                "default_construction", expr("construction IS NULL")
-            ).withColumn("count_construction", lit(0).cast("long"))
+            provided_link_cols += [
+                expr("construction IS NULL AS default_construction"),
+                lit(0).cast("long").alias("count_construction"),
+            ]
 
         else:
             ratio_calculators.append(construction_ratio_calculator)
 
+        # When all of the links are provided imputation doesn't change them so
+        # their defaults and counts are added to the output instead. This means
+        # that the data doesn't need to be split around imputation.
         if not ratio_calculators:
-            return
+            return provided_link_cols
+
+        if provided_link_cols:
+            prepared_df = prepared_df.select("*", *provided_link_cols)
+
+        # Put the values from the current, previous and next periods for a
+        # contributor on the same row. A contributor only has one row per
+        # period and grouping so windows with a frame of exactly one period
+        # either side of the current one find these values without needing
+        # to join the data to itself.
+        contributor_window = Window.partitionBy("ref", "grouping").orderBy(
+            "period_index"
+        )
+        previous_window = contributor_window.rangeBetween(-periodicity, -periodicity)
+        next_window = contributor_window.rangeBetween(periodicity, periodicity)
+        has_output = col("output").isNotNull()
+        adjacent_cols = [
+            col("match").alias("link_inclusion_current"),
+            first("output").over(next_window).alias("next_output"),
+            when(has_output, first("match").over(next_window)).alias(
+                "link_inclusion_next"
+            ),
+            first("output").over(previous_window).alias("previous_output"),
+            when(has_output, first("match").over(previous_window)).alias(
+                "link_inclusion_previous"
+            ),
+        ]
 
-        # Since we're going to join on to the main df filtering here
-        # won't cause us to lose grouping as they'll just be filled with
-        # default ratios.
+        # Rows without an output can't be used to calculate ratios so they
+        # have no link inclusion values. Clearing the match for them rather
+        # than filtering them out means that when filtering the link
+        # inclusions can be kept on the main df without joining them back on.
+        # Any grouping without usable rows is just filled with default ratios.
         if link_filter:
-            ratio_filter_df = prepared_df.join(
-                filtered_refs, ["ref", "period", "grouping"]
+            ratio_filter_df = (
+                prepared_df.join(filtered_refs, ["ref", "period", "grouping"])
+                .withColumn("match", when(has_output, col("match")))
+                .select("*", *adjacent_cols)
+                .drop("match")
+            )
+            ratio_calculation_df = ratio_filter_df.filter("output IS NOT NULL")
+            prepared_df = ratio_filter_df.drop("next_output", "previous_output")
+            output_col_mapping.update(
+                {
+                    "link_inclusion_current": link_inclusion_current_col,
+                    "link_inclusion_previous": link_inclusion_previous_col,
+                    "link_inclusion_next": link_inclusion_next_col,
+                }
             )
+
         else:
-            ratio_filter_df = prepared_df.withColumn("match", lit(True))
+            ratio_calculation_df = (
+                prepared_df.filter("output IS NOT NULL")
+                .select(
+                    "ref",
+                    "period",
+                    "grouping",
+                    "output",
+                    "aux",
+                    "period_index",
+                    lit(True).alias("match"),
+                )
+                .select("*", *adjacent_cols)
+            )
 
-        ratio_filter_df = ratio_filter_df.filter("output IS NOT NULL").select(
+        ratio_calculation_df = ratio_calculation_df.select(
             "ref",
-            "period",
             "grouping",
-            "output",
+            "period",
             "aux",
-            "previous_period",
-            "next_period",
-            "match",
+            "output",
+            "link_inclusion_current",
+            "next_output",
+            "link_inclusion_next",
+            "previous_output",
+            "link_inclusion_previous",
         )
 
-        # Put the values from the current and previous periods for a
-        # contributor on the same row.
-        ratio_calculation_df = (
-            ratio_filter_df.join(
-                ratio_filter_df.selectExpr(
-                    "ref",
-                    "period AS previous_period",
-                    "output AS previous_output",
-                    "grouping",
-                    "match AS link_inclusion_previous",
-                ),
-                ["ref", "grouping", "previous_period"],
-                "leftouter",
-            )
-            .join(
-                ratio_filter_df.selectExpr(
-                    "ref",
-                    "period AS next_period",
-                    "output AS next_output",
-                    "grouping",
-                    "match AS link_inclusion_next",
-                ),
-                ["ref", "next_period", "grouping"],
-                "leftouter",
-            )
-            .selectExpr(
-                "ref",
-                "grouping",
-                "period",
-                "aux",
-                "output",
-                "match AS link_inclusion_current",
-                "next_output",
-                "link_inclusion_next",
-                "previous_output",
-                "link_inclusion_previous",
-            )
-        )
+        # Each ratio calculator reads the ratio calculation data so avoid
+        # recalculating the windows above for every one of them.
+        if len(ratio_calculators) > 1:
+            ratio_calculation_df = ratio_calculation_df.localCheckpoint(eager=False)
 
         # Join the grouping ratios onto the input such that each contributor has
-        # a set of ratios.
+        # a set of ratios. Results which aren't per contributor only have a row
+        # per period and grouping so are small enough to broadcast.
         fill_values = {}
         for result in sum(
             (
@@ -426,43 +510,35 @@ def impute(
             ),
             [],
         ):
-            prepared_df = prepared_df.join(result.data, result.join_columns, "left")
+            result_df = result.data
+            if "ref" not in result.join_columns:
+                result_df = broadcast(result_df)
+
+            prepared_df = prepared_df.join(result_df, result.join_columns, "left")
             fill_values.update(result.fill_values)
             output_col_mapping.update(result.additional_outputs)
 
-        for fill_column, fill_value in fill_values.items():
-            prepared_df = prepared_df.fillna(fill_value, fill_column)
-
-        if link_filter:
-            prepared_df = prepared_df.join(
-                ratio_calculation_df.select(
-                    "ref",
-                    "period",
-                    "grouping",
-                    "link_inclusion_previous",
-                    "link_inclusion_current",
-                    "link_inclusion_next",
-                ),
-                ["ref", "period", "grouping"],
-                "left",
-            )
-            output_col_mapping.update(
-                {
-                    "link_inclusion_current": link_inclusion_current_col,
-                    "link_inclusion_previous": link_inclusion_previous_col,
-                    "link_inclusion_next": link_inclusion_next_col,
-                }
-            )
+        # Fill all of the columns in a single projection.
+        if fill_values:
+            prepared_df = prepared_df.na.fill(fill_values)
 
         if weight is not None:
+            # There's only one set of links per period and grouping so a window
+            # with a frame of exactly the weighting periodicity finds the
+            # previous links without joining the links to themselves.
+            previous_window = (
+                Window.partitionBy("grouping")
+                .orderBy("period_index")
+                .rangeBetween(-weight_periodicity, -weight_periodicity)
+            )
 
             def calculate_weighted_link(link_name):
-                prev_link = col(f"prev.{link_name}")
-                curr_link = col(f"curr.{link_name}")
+                prev_link = first(link_name).over(previous_window)
+                curr_link = col(link_name)
                 return (
                     when(
                         prev_link.isNotNull(),
-                        weight * curr_link + (lit(Decimal(1)) - weight) * prev_link,
+                        weight * curr_link + previous_weight * prev_link,
                     )
                     .otherwise(curr_link)
                     .alias(link_name)
@@ -475,10 +551,12 @@ def impute(
             ]
 
             if not weight_col_names:
-                return
+                return []
 
             weighting_df = (
-                prepared_df.join(prior_period_df, (col("prior_period") < col("period")))
+                prepared_df.join(
+                    prior_period_df, (col("prior_period") < col("period_index"))
+                )
                 .select(
                     "period",
                     "grouping",
@@ -503,25 +581,13 @@ def impute(
                 )
             )
 
-            curr_df = weighting_df.alias("curr")
-            prev_df = weighting_df.alias("prev")
             prepared_df = (
-                curr_df.join(
-                    prev_df,
-                    (
-                        (
-                            col("prev.period")
-                            == calculate_previous_period(
-                                col("curr.period"), weight_periodicity
-                            )
-                        )
-                        & (col("curr.grouping") == col("prev.grouping"))
-                    ),
-                    "left",
+                weighting_df.withColumn(
+                    "period_index", calculate_period_index(col("period"))
                 )
                 .select(
-                    expr("curr.period AS period"),
-                    expr("curr.grouping AS grouping"),
+                    "period",
+                    "grouping",
                     *(calculate_weighted_link(name) for name in weight_col_names),
                 )
                 .join(
@@ -534,7 +600,9 @@ def impute(
                 )
             )
 
-    calculate_ratios()
+        return []
+
+    output_link_cols = calculate_ratios()
 
     # Caching for both imputed and unimputed data.
     imputed_df = None
@@ -546,24 +614,38 @@ def impute(
     ) -> DataFrame:
         nonlocal imputed_df
         nonlocal null_response_df
+        # The period being imputed from is derived from the period index when
+        # joining rather than being carried through every stage.
         if direction:
             # Forward imputation
-            other_period_col = "previous_period"
+            other_period = col("period_index") - periodicity
         else:
             # Backward imputation
-            other_period_col = "next_period"
+            other_period = col("period_index") + periodicity
 
         if imputed_df is None:
-            working_df = df.select(
-                "ref",
-                "period",
-                "grouping",
-                "output",
-                "marker",
-                "previous_period",
-                "next_period",
-                "forward",
-                "backward",
+            # Any ref and grouping combos which have no values at all can't be
+            # imputed from so we don't care about them here. Counting the
+            # values over a window finds these without a separate distinct and
+            # join. The result is checkpointed once so that splitting it into
+            # values and nulls below is a single pass over the data.
+            working_df = (
+                df.select(
+                    "ref",
+                    "period",
+                    "grouping",
+                    "output",
+                    "marker",
+                    "period_index",
+                    "forward",
+                    "backward",
+                    count("output")
+                    .over(Window.partitionBy("ref", "grouping"))
+                    .alias("value_count"),
+                )
+                .filter(col("value_count") > 0)
+                .drop("value_count")
+                .localCheckpoint(eager=True)
             )
 
             # Anything which isn't null is already imputed or a response and thus
@@ -571,71 +653,99 @@ def impute(
             # this still holds since it always happens after forward imputation
             # and thus it can never attempt to backward impute from a forward
             # imputation since there will never be a null value directly prior to
-            # one.
-            imputed_df = working_df.filter(~col("output").isNull()).localCheckpoint(
-                eager=True
+            # one. Only the values being imputed need the links so these aren't
+            # kept with the values being imputed from.
+            imputed_df = working_df.filter(~col("output").isNull()).drop(
+                "forward", "backward"
             )
-            # Any ref and grouping combos which have no values at all can't be
-            # imputed from so we don't care about them here.
-            ref_df = imputed_df.select("ref", "grouping").distinct()
-            null_response_df = (
-                working_df.filter(col("output").isNull())
-                .drop("output", "marker")
-                .join(ref_df, ["ref", "grouping"])
-                .localCheckpoint(eager=True)
+            null_response_df = working_df.filter(col("output").isNull()).drop(
+                "output", "marker"
             )
 
-        while True:
-            other_df = imputed_df.selectExpr(
+        # Values can only be imputed from values which have appeared since the
+        # last iteration as anything older would already have been used. This
+        # doesn't hold across phases since the direction can change so start
+        # from everything imputed so far.
+        frontier_df = imputed_df
+        new_imputed_dfs = []
+        # Stop as soon as there's nothing left to impute rather than joining an
+        # empty set of nulls. This set always comes from a checkpoint so
+        # checking it doesn't require recalculating anything.
+        while null_response_df.take(1):
+            other_df = frontier_df.selectExpr(
                 "ref AS other_ref",
-                "period AS other_period",
+                "period_index AS other_period",
                 "output AS other_output",
                 "grouping AS other_grouping",
             )
-            calculation_df = (
-                null_response_df.join(
-                    other_df,
-                    [
-                        col(other_period_col) == col("other_period"),
-                        col("ref") == col("other_ref"),
-                        col("grouping") == col("other_grouping"),
-                    ],
-                )
-                .select(
-                    "ref",
-                    "period",
-                    "grouping",
-                    (col(link_col) * col("other_output")).alias("output"),
-                    lit(marker.value).alias("marker"),
-                    "previous_period",
-                    "next_period",
-                    "forward",
-                    "backward",
-                )
-                .localCheckpoint(eager=False)
+            # A single outer join splits the nulls into those which can be
+            # imputed in this iteration and those which can't. This avoids
+            # joining the imputed rows back on to remove them from the nulls.
+            joined_df = null_response_df.join(
+                other_df,
+                [
+                    other_period == col("other_period"),
+                    col("ref") == col("other_ref"),
+                    col("grouping") == col("other_grouping"),
+                ],
+                "leftouter",
+            ).localCheckpoint(eager=True)
+            calculation_df = joined_df.filter(col("other_ref").isNotNull()).select(
+                "ref",
+                "period",
+                "grouping",
+                (col(link_col) * col("other_output")).alias("output"),
+                lit(marker.value).alias("marker"),
+                "period_index",
             )
             # If we've imputed nothing then we've got as far as we can get for
-            # this phase.
-            if calculation_df.count() == 0:
+            # this phase. A single row is enough to know that we haven't.
+            if not calculation_df.take(1):
                 break
 
-            # Store this set of imputed values in our main set for the next
-            # iteration. Use eager checkpoints to help prevent rdd DAG explosion.
-            imputed_df = imputed_df.union(calculation_df).localCheckpoint(eager=True)
-            # Remove the newly imputed rows from our filtered set.
-            null_response_df = null_response_df.join(
-                calculation_df.select("ref", "period", "grouping"),
-                ["ref", "period", "grouping"],
-                "leftanti",
-            ).localCheckpoint(eager=True)
+            # Keep this set of imputed values to add to our main set once this
+            # phase is complete. Each set comes from a checkpoint so doing a
+            # single union at the end keeps the plan flat rather than growing
+            # it and copying the main set on every iteration.
+            new_imputed_dfs.append(calculation_df)
+            frontier_df = calculation_df
+            # Anything which couldn't be imputed is still null.
+            null_response_df = joined_df.filter(col("other_ref").isNull()).select(
+                null_response_df.columns
+            )
+
+        # If this phase couldn't impute anything then there's nothing to update.
+        if not new_imputed_dfs:
+            return df
+
+        # The newly imputed values are read again both below and by the next
+        # phase. Checkpointing them here also means the checkpoints from each
+        # iteration, which contain the nulls as well, are no longer referenced
+        # and so can be cleaned up rather than being kept until the end.
+        new_imputed_df = reduce(DataFrame.union, new_imputed_dfs).localCheckpoint(
+            eager=True
+        )
+        imputed_df = imputed_df.union(new_imputed_df)
 
         # We should now have an output column which is as fully populated as
-        # this phase of imputation can manage. As such replace the existing
-        # output column with our one. Same goes for the marker column.
-        return df.drop("output", "marker").join(
-            imputed_df.select("ref", "period", "grouping", "output", "marker"),
-            ["ref", "period", "grouping"],
+        # this phase of imputation can manage. Only the values imputed in this
+        # phase differ from the existing ones so just these are joined on to
+        # update the output and marker columns. The integer period index is
+        # cheaper to hash and compare than the period so it's used as the key.
+        return df.join(
+            new_imputed_df.selectExpr(
+                "ref",
+                "period_index",
+                "grouping",
+                "output AS imputed_output",
+                "marker AS imputed_marker",
+            ),
+            ["ref", "period_index", "grouping"],
             "leftouter",
+        ).select(
+            *(c for c in df.columns if c not in ("output", "marker")),
+            coalesce("imputed_output", "output").alias("output"),
+            coalesce("imputed_marker", "marker").alias("marker"),
         )
 
     # --- Imputation functions ---
@@ -658,56 +768,32 @@ def impute(
         if back_data_df:
             df = df.unionByName(
                 back_data_period_df.filter(
-                    (
-                        (col("marker") == lit(Marker.CONSTRUCTED.value))
-                        | (
-                            col("marker")
-                            == lit(Marker.FORWARD_IMPUTE_FROM_CONSTRUCTION.value)
-                        )
+                    col("marker").isin(
+                        Marker.CONSTRUCTED.value,
+                        Marker.FORWARD_IMPUTE_FROM_CONSTRUCTION.value,
                     )
                 ),
                 allowMissingColumns=True,
             )
 
-        construction_df = df.filter(df.output.isNull()).select(
-            "ref", "period", "grouping", "aux", "construction", "previous_period"
+        # Values are only constructed where the contributor has no row at all
+        # for the previous period. A window with a frame of exactly that period
+        # finds these rows without joining the data to itself and then joining
+        # the constructed values back on.
+        previous_window = (
+            Window.partitionBy("ref", "grouping")
+            .orderBy("period_index")
+            .rangeBetween(-periodicity, -periodicity)
         )
-        other_df = df.select("ref", "period", "grouping").alias("other")
-        construction_df = construction_df.alias("construction")
-        construction_df = construction_df.join(
-            other_df,
-            [
-                col("construction.ref") == col("other.ref"),
-                col("construction.previous_period") == col("other.period"),
-                col("construction.grouping") == col("other.grouping"),
-            ],
-            "leftanti",
-        ).select(
-            col("construction.ref").alias("ref"),
-            col("construction.period").alias("period"),
-            col("construction.grouping").alias("grouping"),
-            (col("aux") * col("construction")).alias("constructed_output"),
-            lit(Marker.CONSTRUCTED.value).alias("constructed_marker"),
-        )
-
-        return (
-            df.withColumnRenamed("output", "existing_output")
-            .withColumnRenamed("marker", "existing_marker")
-            .join(
-                construction_df,
-                ["ref", "period", "grouping"],
-                "leftouter",
-            )
-            .select(
-                "*",
-                when(col("existing_output").isNull(), col("constructed_output"))
-                .otherwise(col("existing_output"))
-                .alias("output"),
-                when(col("existing_marker").isNull(), col("constructed_marker"))
-                .otherwise(col("existing_marker"))
-                .alias("marker"),
-            )
-            .drop("existing_output", "constructed_output", "constructed_marker")
+        construct = col("output").isNull() & (count(lit(1)).over(previous_window) == 0)
+        return df.select(
+            *(c for c in df.columns if c not in ("output", "marker")),
+            when(construct, col("aux") * col("construction"))
+            .otherwise(col("output"))
+            .alias("output"),
+            when(construct, lit(Marker.CONSTRUCTED.value))
+            .otherwise(col("marker"))
+            .alias("marker"),
         )
 
     def forward_impute_from_construction(df: DataFrame) -> DataFrame:
@@ -721,18 +807,64 @@ def impute(
             df, "forward", Marker.FORWARD_IMPUTE_FROM_CONSTRUCTION, True
         )
 
-    df = prepared_df
-    for stage in (
+    # Only some of the columns are needed for imputation. Put the rest (e.g.
+    # counts and any additional ratio calculator outputs) to one side rather
+    # than carrying them through every stage and join them back on at the end.
+    # When the links are all provided there's nothing to put to one side so
+    # the prepared data isn't split or checkpointed. The first imputation
+    # stage reads it twice: once for the values it checkpoints to work on
+    # and again when joining its results back on.
+    impute_cols = [
+        "ref",
+        "period",
+        "grouping",
+        "output",
+        "marker",
+        "period_index",
+        "aux",
+        "forward",
+        "backward",
+        "construction",
+    ]
+    if not output_link_cols:
+        prepared_df = prepared_df.localCheckpoint(eager=False)
+        extra_df = prepared_df.select(
+            "ref",
+            "period_index",
+            "grouping",
+            *(c for c in prepared_df.columns if c not in impute_cols),
+        )
+
+    df = prepared_df.select(impute_cols)
+    stages = (
         forward_impute_from_response,
         backward_impute,
         construct_values,
         forward_impute_from_construction,
-    ):
-        df = stage(df).localCheckpoint(eager=False)
-        if df.filter(col("output").isNull()).count() == 0:
+    )
+    for stage in stages:
+        df = stage(df)
+        # The output of the final stage is only read once to create the output
+        # so there's no point checkpointing it or checking it for remaining
+        # nulls since there's nothing left to skip.
+        if stage is stages[-1]:
+            break
+
+        df = df.localCheckpoint(eager=False)
+        # This check materialises the whole checkpoint anyway but taking a
+        # single null avoids also aggregating a count of them.
+        if not df.filter(col("output").isNull()).take(1):
             break
 
-    return df.join(prior_period_df, [col("prior_period") < col("period")]).select(
+    if output_link_cols:
+        df = df.select("*", *output_link_cols)
+
+    else:
+        # The ratio calculators always add count and default columns so
+        # there are always extra columns to join back on.
+        df = df.join(extra_df, ["ref", "period_index", "grouping"], "leftouter")
+
+    return df.join(prior_period_df, [col("prior_period") < col("period_index")]).select(
         [
             col(k).alias(output_col_mapping[k])
             for k in sorted(output_col_mapping.keys() & set(df.columns))
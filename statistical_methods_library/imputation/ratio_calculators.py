@@ -185,77 +185,70 @@ def mean_of_ratios(
         def upper_bound(c):
             return 1 + sql_floor(c * (100 - upper_trim) / 100)
 
+        # The counts needed for trimming are calculated per period and grouping
+        # using the same partitioning as the row numbers below rather than
+        # aggregating them separately and joining them back on.
         df = (
-            df.join(
-                (
-                    df.groupBy("period", "grouping")
-                    .agg(
-                        expr(
-                            """
-                            sum(
-                                cast(growth_forward IS NOT NULL AS integer)
-                            ) AS count_forward
-                            """
-                        ),
-                        expr(
-                            """
-                            sum(
-                                cast(growth_backward IS NOT NULL AS integer)
-                            ) AS count_backward
-                            """
-                        ),
-                        expr(
-                            """
-                            sum(
-                                cast(
-                                    not (
-                                        (link_inclusion_previous OR
-                                        link_inclusion_previous IS NULL)
-                                        AND link_inclusion_current
-                                    )
-                                AS integer)
+            df.select(
+                "*",
+                expr(
+                    """
+                    sum(
+                        cast(growth_forward IS NOT NULL AS integer)
+                    ) OVER (PARTITION BY period, grouping) AS count_forward
+                    """
+                ),
+                expr(
+                    """
+                    sum(
+                        cast(growth_backward IS NOT NULL AS integer)
+                    ) OVER (PARTITION BY period, grouping) AS count_backward
+                    """
+                ),
+                expr(
+                    """
+                    sum(
+                        cast(
+                            not (
+                                (link_inclusion_previous OR
+                                link_inclusion_previous IS NULL)
+                                AND link_inclusion_current
                             )
-                            AS count_exclusion_forward
-                            """
-                        ),
-                        expr(
-                            """
-                            sum(
-                                cast(
-                                    not (
-                                        (link_inclusion_next OR
-                                        link_inclusion_next IS NULL)
-                                        AND link_inclusion_current
-                                    )
-                                    AS integer
-                                )
+                        AS integer)
+                    ) OVER (PARTITION BY period, grouping)
+                    AS count_exclusion_forward
+                    """
+                ),
+                expr(
+                    """
+                    sum(
+                        cast(
+                            not (
+                                (link_inclusion_next OR
+                                link_inclusion_next IS NULL)
+                                AND link_inclusion_current
                             )
-                            AS count_exclusion_backward
-                            """
-                        ),
-                    )
-                    .select(
-                        col("period"),
-                        col("grouping"),
-                        col("count_exclusion_forward"),
-                        col("count_exclusion_backward"),
-                        col("count_forward"),
-                        col("count_backward"),
-                        lower_bound(
-                            col("count_forward"),
-                        ).alias("lower_forward"),
-                        upper_bound(
-                            col("count_forward"),
-                        ).alias("upper_forward"),
-                        lower_bound(
-                            col("count_backward"),
-                        ).alias("lower_backward"),
-                        upper_bound(
-                            col("count_backward"),
-                        ).alias("upper_backward"),
-                    )
+                            AS integer
+                        )
+                    ) OVER (PARTITION BY period, grouping)
+                    AS count_exclusion_backward
+                    """
                 ),
-                ["period", "grouping"],
+            )
+            .select(
+                "*",
+                lower_bound(
+                    col("count_forward"),
+                ).alias("lower_forward"),
+                upper_bound(
+                    col("count_forward"),
+                ).alias("upper_forward"),
+                lower_bound(
+                    col("count_backward"),
+                ).alias("lower_backward"),
+                upper_bound(
+                    col("count_backward"),
+                ).alias("upper_backward"),
             )
             # When calculating row numbers we put the null values last to avoid
             # them impacting the trimmed mean. This works because the upper
@@ -9,7 +9,7 @@ import typing
 from enum import Enum
 
 from pyspark.sql import DataFrame
-from pyspark.sql.functions import col, expr, lit, when
+from pyspark.sql.functions import broadcast, col, expr, lit, sum, when
 from pyspark.sql.types import DecimalType
 
 from statistical_methods_library.utilities import validation
@@ -112,28 +112,39 @@ def outlier(
         "auxiliary": DecimalType,
     }
 
+    # All checks are performed against the aliased columns selected during
+    # validation rather than the full input.
+    checks = [
+        validation.no_matching_rows_check(
+            col("design") < 1,
+            f"Column {design_col} must not contain values smaller than one.",
+        ),
+        validation.no_matching_rows_check(
+            col("l_value") < 0,
+            f"Column {l_value_col} must not contain negative values.",
+        ),
+    ]
+    if calibration_col is not None:
+        checks.append(
+            validation.no_matching_rows_check(
+                col("calibration") <= 0,
+                f"Column {calibration_col} must not contain zero or negative values.",
+            )
+        )
+
     aliased_df = validation.validate_dataframe(
-        input_df, input_params, type_mapping, ["reference", "period", "grouping"]
-    )
-    validation.validate_one_value_per_group(
-        input_df, [period_col, grouping_col], l_value_col
-    )
-    validation.validate_no_matching_rows(
         input_df,
-        (col(design_col) < 1),
-        f"Column {design_col} must not contain values smaller than one.",
+        input_params,
+        type_mapping,
+        ["reference", "period", "grouping"],
+        additional_checks=checks,
     )
-    validation.validate_no_matching_rows(
-        input_df,
-        (col(l_value_col) < 0),
-        f"Column {l_value_col} must not contain negative values.",
+    validation.validate_one_value_per_group(
+        aliased_df,
+        ["period", "grouping"],
+        "l_value",
+        f"The {l_value_col} must be the same per {period_col} {grouping_col}.",
     )
-    if calibration_col is not None:
-        validation.validate_no_matching_rows(
-            input_df,
-            (col(calibration_col) <= 0),
-            f"Column {calibration_col} must not contain zero or negative values.",
-        )
 
     # If we don't have a calibration factor and auxiliary value then set to 1.
     # This cancels out the ratio part of Winsorisation which means that
@@ -168,20 +179,27 @@ def outlier(
     )
     to_be_winsorised_df = df.filter(col("marker").isNull())
 
+    output_cols = ["reference", "period", "grouping", "outlier", "marker"]
+
     # The design ratio needs to be calculated by grouping whereas the outlier
-    # weight calculation is per contributor.
+    # weight calculation is per contributor. The sums are partially aggregated
+    # before being shuffled and only have a row per period and grouping so the
+    # ratios are broadcast rather than shuffling the contributors to join them.
     # If the outlier weight can't be calculated due to the target value being a zero,
     # then default the outlier weight to 1.
     return (
         to_be_winsorised_df.join(
-            (
-                to_be_winsorised_df.withColumn("target_design", expr("target * design"))
-                .withColumn("aux_design", expr("auxiliary * design"))
-                .groupBy(group_cols)
-                .agg({"target_design": "sum", "aux_design": "sum"})
-                .withColumn(
-                    "ratio_sum_target_sum_aux",
-                    col("sum(target_design)") / col("sum(aux_design)"),
+            broadcast(
+                to_be_winsorised_df.groupBy(group_cols)
+                .agg(
+                    sum(col("target") * col("design")).alias("target_design_sum"),
+                    sum(col("auxiliary") * col("design")).alias("aux_design_sum"),
+                )
+                .select(
+                    *group_cols,
+                    (col("target_design_sum") / col("aux_design_sum")).alias(
+                        "ratio_sum_target_sum_aux"
+                    ),
                 )
             ),
             group_cols,
@@ -203,20 +221,10 @@ def outlier(
                 ),
             ).otherwise(col("target")),
         )
-        .withColumn("outlier", expr("modified_target/target"))
-        .fillna(1.0, ["outlier"])
+        .withColumn("outlier", expr("coalesce(modified_target/target, 1)"))
         .withColumn("marker", lit(Marker.WINSORISED.value))
-        .drop(
-            "target_design",
-            "aux_design",
-            "ratio_sum_target_sum_aux",
-            "sum(target_design)",
-            "sum(aux_design)",
-            "winsorisation_value",
-            "k_value",
-            "modified_target",
-        )
-        .unionByName(not_winsorised_df)
+        .select(output_cols)
+        .unionByName(not_winsorised_df.select(output_cols))
         .select(
             col("reference").alias(reference_col),
             col("period").alias(period_col),
@@ -29,16 +29,7 @@ def calculate_previous_period(period: Column, relative: int):
     A column containing the previous period.
     """
 
-    period = period.cast("integer")
-    return lpad(
-        (
-            period
-            - relative
-            - 88 * (relative // 12 + (period % 100 <= relative % 12).cast("integer"))
-        ).cast("string"),
-        6,
-        "0",
-    )
+    return _calculate_period_from_index(calculate_period_index(period) - relative)
 
 
 def calculate_next_period(period: Column, relative: int) -> Column:
@@ -53,14 +44,32 @@ def calculate_next_period(period: Column, relative: int) -> Column:
     A column containing the next period.
     """
 
+    return _calculate_period_from_index(calculate_period_index(period) + relative)
+
+
+def calculate_period_index(period: Column) -> Column:
+    """
+    Calculate an index for the period.
+
+    The index counts the periods since the start of year 0 so the index of a
+    previous or next period can be found by subtracting or adding the
+    relative amount of periods.
+
+    Args:
+        period: The column containing the period.
+
+    Returns:
+    An integer column containing the period index.
+    """
+
     period = period.cast("integer")
+    return (period / 100).cast("integer") * 12 + period % 100 - 1
+
+
+def _calculate_period_from_index(index: Column) -> Column:
+    # The inverse of calculate_period_index.
     return lpad(
-        (
-            period
-            + relative
-            + 88
-            * (relative // 12 + ((period % 100) + (relative % 12) > 12).cast("integer"))
-        ).cast("string"),
+        ((index / 12).cast("integer") * 100 + index % 12 + 1).cast("string"),
         6,
         "0",
     )
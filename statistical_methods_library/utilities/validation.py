@@ -4,30 +4,47 @@ Data frame validation and aliasing functions.
 For Copyright information, please see LICENCE.
 """
 
+from functools import lru_cache
+
 from pyspark.sql import DataFrame
-from pyspark.sql.functions import col
+from pyspark.sql.functions import col, countDistinct, max
 
 from statistical_methods_library.utilities.exceptions import ValidationError
 
 
+# Column names are usually the same across calls so only check each
+# combination once. Failures raise and are thus never cached. The names
+# must already be known to be strings so that they can be hashed.
+@lru_cache(maxsize=128)
+def _validate_column_names(col_names):
+    for col_name in col_names:
+        if not len(col_name):
+            raise ValueError(
+                "Column name strings provided in params must not be empty."
+            )
+
+
 def validate_dataframe(
-    input_df, expected_columns, type_mapping, unique_cols, excluded_columns=[]
+    input_df,
+    expected_columns,
+    type_mapping,
+    unique_cols,
+    excluded_columns=[],
+    additional_checks=(),
+    validate_content=True,
 ):
     if not isinstance(input_df, DataFrame):
         raise TypeError("input_df must be an instance of pyspark.sql.DataFrame")
-    expected_input_col_names = set(expected_columns.values())
     # Check to see if the column names have been passed in properly.
-    for col_name in expected_input_col_names:
-        if not isinstance(col_name, str):
-            raise TypeError("All column names provided in params must be strings.")
+    col_names = tuple(expected_columns.values())
+    if not all(isinstance(col_name, str) for col_name in col_names):
+        raise TypeError("All column names provided in params must be strings.")
 
-        if not len(col_name):
-            raise ValueError(
-                "Column name strings provided in params must not be empty."
-            )
+    _validate_column_names(col_names)
 
     # Check to see if any required columns are missing from the dataframe.
-    missing_columns = expected_input_col_names - set(input_df.columns)
+    input_col_names = frozenset(input_df.columns)
+    missing_columns = [c for c in expected_columns.values() if c not in input_col_names]
     if missing_columns:
         raise ValidationError(
             f"Missing columns: {', '.join(c for c in missing_columns)}"
@@ -57,36 +74,74 @@ def validate_dataframe(
             )
         )
 
-    # Duplicate check
-    if (
-        aliased_df.select(*unique_cols).distinct().count()
-        != aliased_df.select(*unique_cols).count()
-    ):
-        raise ValidationError("Duplicate contributors")
+    # The remaining checks need to scan the data so the caller may opt out of
+    # them if it can guarantee they will pass.
+    if not validate_content:
+        return aliased_df
 
-    # Check to see if the columns contain null values.
-    for col_name in expected_columns:
-        if col_name in excluded_columns:
-            continue
+    # Duplicate check. A single grouped count finds any duplicates in one
+    # aggregation rather than comparing the results of two separate counts.
+    if aliased_df.groupBy(*unique_cols).count().filter(col("count") > 1).take(1):
+        raise ValidationError("Duplicate contributors")
 
-        if aliased_df.filter(col(col_name).isNull()).count() > 0:
-            raise ValidationError(
-                f"Input column {col_name} must not contain null values."
-            )
+    # Check to see if the columns contain null values. This is done in the
+    # same pass over the data as any additional checks provided by the
+    # caller (which must refer to the aliased column names).
+    checks = [
+        no_matching_rows_check(
+            col(col_name).isNull(),
+            f"Input column {col_name} must not contain null values.",
+        )
+        for col_name in expected_columns
+        if col_name not in excluded_columns
+    ]
+    checks.extend(additional_checks)
+    validate_aggregates(aliased_df, checks)
 
     return aliased_df
 
 
-def validate_one_value_per_group(input_df, group_cols, value_col):
-    if (
-        input_df.select(*group_cols).distinct().count()
-        != input_df.select(*group_cols, value_col).distinct().count()
-    ):
-        raise ValidationError(
+def validate_aggregates(input_df, checks):
+    # Each check is a pair of an aggregate expression which is true if the
+    # data is invalid and the error message to raise in that case. All checks
+    # are computed in a single aggregation and the first failure is raised.
+    if not checks:
+        return
+
+    result = input_df.agg(
+        *(check.alias(f"check_{i}") for i, (check, _) in enumerate(checks))
+    ).first()
+    for i, (_, error_message) in enumerate(checks):
+        if result[i]:
+            raise ValidationError(error_message)
+
+
+def no_matching_rows_check(filter, error_message):
+    # The max of a boolean is true if any row matches which can be reduced
+    # within each partition without counting every matching row.
+    return (max(filter), error_message)
+
+
+def validate_one_value_per_group(input_df, group_cols, value_col, error_message=None):
+    if error_message is None:
+        error_message = (
             f"The {value_col} must be the same per " + " ".join(group_cols) + "."
         )
 
+    # Only a single shuffle is needed to find whether any group has more than
+    # one value. countDistinct ignores nulls so a null is counted separately
+    # as a value of its own.
+    distinct_values = countDistinct(value_col) + max(
+        col(value_col).isNull().cast("int")
+    )
+    if (
+        input_df.groupBy(*group_cols)
+        .agg((distinct_values > 1).alias("multiple_values"))
+        .agg(max("multiple_values"))
+        .first()[0]
+    ):
+        raise ValidationError(error_message)
+
 
 def validate_no_matching_rows(input_df, filter, error_message):
-    if input_df.filter(filter).count() > 0:
-        raise ValidationError(error_message)
+    validate_aggregates(input_df, [no_matching_rows_check(filter, error_message)])
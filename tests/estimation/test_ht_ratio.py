@@ -289,6 +289,69 @@ def test_dataframe_mixed_h_values_in_strata(fxt_load_test_csv):
         ht_ratio.estimate(test_dataframe, **estimation_params)
 
 
+# Test validation of the input data can be skipped
+@pytest.mark.dependency()
+def test_dataframe_validation_skipped(fxt_load_test_csv):
+    test_dataframe = fxt_load_test_csv(
+        dataframe_columns,
+        dataframe_types,
+        "estimation",
+        "ht_ratio",
+        "unit",
+        "mixed_h-values_in_strata",
+    )
+    estimation_params = params.copy()
+    estimation_params.update(
+        {"adjustment_marker_col": adjustment_marker_col, "h_value_col": h_col}
+    )
+    ret_val = ht_ratio.estimate(
+        test_dataframe, **estimation_params, validate_input=False
+    )
+    design_weights = {
+        (row[period_col], row[strata_col]): row[design_weight_col]
+        for row in ret_val.collect()
+    }
+    # The h values are mixed in this stratum so either h value may be used.
+    assert design_weights.pop(("202009", "10")) in (2, 6)
+    assert design_weights == {
+        ("202009", "11"): 6,
+        ("202009", "12"): 2,
+        ("202010", "10"): 6,
+        ("202010", "11"): 6,
+        ("202010", "12"): 2,
+    }
+
+
+# Test column names and types are still checked when skipping validation
+@pytest.mark.dependency()
+def test_dataframe_validation_skipped_column_missing(fxt_load_test_csv):
+    test_dataframe = fxt_load_test_csv(
+        dataframe_columns,
+        dataframe_types,
+        "estimation",
+        "ht_ratio",
+        "unit",
+        "basic_functionality",
+    )
+    bad_dataframe = test_dataframe.drop(strata_col)
+    with pytest.raises(ValidationError):
+        ht_ratio.estimate(bad_dataframe, **params, validate_input=False)
+
+
+@pytest.mark.dependency()
+def test_dataframe_validation_skipped_incorrect_column_types(fxt_load_test_csv):
+    test_dataframe = fxt_load_test_csv(
+        dataframe_columns,
+        bad_dataframe_types,
+        "estimation",
+        "ht_ratio",
+        "unit",
+        "basic_functionality",
+    )
+    with pytest.raises(ValidationError):
+        ht_ratio.estimate(test_dataframe, **params, validate_input=False)
+
+
 # Test output is correct type
 @pytest.mark.dependency()
 def test_dataframe_correct_type(fxt_spark_session, fxt_load_test_csv):
@@ -342,6 +342,40 @@ def test_back_data_drops_link_cols_when_present(fxt_load_test_csv, fxt_spark_ses
     assert ret_val.count() == 1
 
 
+# Test that back data is used when the marker column has a different name.
+def test_back_data_with_renamed_marker_col(fxt_load_test_csv, fxt_spark_session):
+    test_dataframe = fxt_load_test_csv(
+        dataframe_columns,
+        dataframe_types,
+        "imputation",
+        "engine",
+        "unit",
+        "basic_functionality",
+    )
+
+    back_data = fxt_load_test_csv(
+        dataframe_columns,
+        dataframe_types,
+        "imputation",
+        "engine",
+        "unit",
+        "back_data_with_link_cols",
+    ).withColumnRenamed(marker_col, "previous_marker")
+
+    imputation_kwargs = params.copy()
+    imputation_kwargs.update(
+        {
+            "marker_col": "previous_marker",
+            "input_df": test_dataframe,
+            "back_data_df": back_data,
+        }
+    )
+
+    ret_val = impute(**imputation_kwargs)
+
+    assert ret_val.count() == 1
+
+
 # Test when main data input has link cols and the back data input does not
 # then columns aren't lost.
 def test_input_has_link_cols_and_back_data_does_not_have_link_cols(
@@ -0,0 +1,81 @@
+import pytest
+from pyspark.sql.functions import col
+
+from statistical_methods_library.utilities.periods import (
+    calculate_next_period,
+    calculate_period_index,
+    calculate_previous_period,
+)
+
+
+def evaluate(session, period, expression):
+    return (
+        session.createDataFrame([(period,)], "period string")
+        .select(expression(col("period")))
+        .first()[0]
+    )
+
+
+@pytest.mark.parametrize(
+    "period, relative, expected",
+    [
+        ("202002", 1, "202001"),
+        ("202001", 1, "201912"),
+        ("202001", 12, "201901"),
+        ("202003", 15, "201812"),
+        ("202012", 24, "201812"),
+    ],
+)
+def test_calculate_previous_period(fxt_spark_session, period, relative, expected):
+    previous_period = evaluate(
+        fxt_spark_session, period, lambda p: calculate_previous_period(p, relative)
+    )
+    assert previous_period == expected
+
+
+@pytest.mark.parametrize(
+    "period, relative, expected",
+    [
+        ("202011", 1, "202012"),
+        ("202012", 1, "202101"),
+        ("202012", 12, "202112"),
+        ("202010", 15, "202201"),
+        ("201901", 24, "202101"),
+    ],
+)
+def test_calculate_next_period(fxt_spark_session, period, relative, expected):
+    next_period = evaluate(
+        fxt_spark_session, period, lambda p: calculate_next_period(p, relative)
+    )
+    assert next_period == expected
+
+
+@pytest.mark.parametrize(
+    "period, expected",
+    [("000001", 0), ("201912", 24239), ("202001", 24240), ("202012", 24251)],
+)
+def test_calculate_period_index(fxt_spark_session, period, expected):
+    assert evaluate(fxt_spark_session, period, calculate_period_index) == expected
+
+
+# Moving a period back and then forward by the same amount must give the
+# original period and the index must move by exactly that amount.
+@pytest.mark.parametrize("period", ["201901", "201906", "201912"])
+@pytest.mark.parametrize("relative", [0, 1, 11, 12, 13, 25])
+def test_period_round_trip(fxt_spark_session, period, relative):
+    round_trip_period = evaluate(
+        fxt_spark_session,
+        period,
+        lambda p: calculate_next_period(
+            calculate_previous_period(p, relative), relative
+        ),
+    )
+    assert round_trip_period == period
+
+    index_difference = evaluate(
+        fxt_spark_session,
+        period,
+        lambda p: calculate_period_index(p)
+        - calculate_period_index(calculate_previous_period(p, relative)),
+    )
+    assert index_difference == relative
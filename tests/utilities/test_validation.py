@@ -0,0 +1,41 @@
+import pytest
+
+from statistical_methods_library.utilities.exceptions import ValidationError
+from statistical_methods_library.utilities.validation import (
+    validate_dataframe,
+    validate_one_value_per_group,
+)
+
+value_schema = "period string, grouping string, value string"
+
+
+def test_one_value_per_group(fxt_spark_session):
+    test_dataframe = fxt_spark_session.createDataFrame(
+        [("202001", "A", "1"), ("202001", "A", "1"), ("202001", "B", None)],
+        value_schema,
+    )
+    validate_one_value_per_group(test_dataframe, ["period", "grouping"], "value")
+
+
+def test_one_value_per_group_multiple_values(fxt_spark_session):
+    test_dataframe = fxt_spark_session.createDataFrame(
+        [("202001", "A", "1"), ("202001", "A", "2")], value_schema
+    )
+    with pytest.raises(ValidationError):
+        validate_one_value_per_group(test_dataframe, ["period", "grouping"], "value")
+
+
+# A null is a different value to any non-null value in the group.
+def test_one_value_per_group_value_and_null(fxt_spark_session):
+    test_dataframe = fxt_spark_session.createDataFrame(
+        [("202001", "A", "1"), ("202001", "A", None)], value_schema
+    )
+    with pytest.raises(ValidationError):
+        validate_one_value_per_group(test_dataframe, ["period", "grouping"], "value")
+
+
+# Column names which can't be hashed still get the documented error.
+def test_dataframe_column_name_not_string(fxt_spark_session):
+    test_dataframe = fxt_spark_session.createDataFrame([("1",)], "ref string")
+    with pytest.raises(TypeError, match="must be strings"):
+        validate_dataframe(test_dataframe, {"ref": ["ref"]}, {}, ["ref"])